@@ -1,10 +1,16 @@
 import streamlit as st
-import pandas as pd
-import requests
-import json
+import asyncio
+import threading
+import orjson
 import time
-from io import StringIO
-import base64
+import io
+import hashlib
+import os
+import urllib.parse
+import re
+import http.server
+import secrets
+from datetime import datetime
 
 
 
@@ -17,7 +23,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -72,56 +78,256 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Page header, static like the CSS
+_HEADER = (
+    "<h1 class='main-header'>🎵 Singapore River Dreams Song Generator</h1>"
+    "<p style='text-align: center; font-size: 1.2em; color: #666;'>Transform collective dreams about Singapore's river into beautiful songs</p>"
+)
+
+def _inject_css():
+    """Emit the custom CSS as raw HTML, skipping the markdown parser"""
+    st.html(_CSS)
+
+def _render_header():
+    """Emit the page header"""
+    st.markdown(_HEADER, unsafe_allow_html=True)
+
+# API endpoints
+CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+SUNO_API_URL = "https://apibox.erweima.ai/api/v1/generate"
+SUNO_STATUS_URL = "https://apibox.erweima.ai/api/v1/generate/record-info"
+
+# Timeouts for API calls: (connect, read) in seconds
+API_TIMEOUT = (5, 120)
+
+@st.cache_resource
+def get_http_session():
+    """One HTTP session shared by all reruns and user sessions of this process.
+
+    Streamlit re-executes this script on every rerun, so a module-level
+    session would be rebuilt each time; caching it keeps its connection
+    pool, and the TLS sessions in it, alive for the life of the server.
+    """
+    # Imported here so the first page paints before requests is loaded
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    # Transient failures (rate limits, overloaded or failing servers) are retried
+    # with exponential backoff, honouring Retry-After; after the last attempt
+    # the error response is returned so callers can report it
+    retry = Retry(
+        total=5,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504, 529),
+        allowed_methods=("GET", "POST"),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    
+    # Suno's generate POST creates a billed task, and a 5xx or a dropped
+    # response may come after the task was accepted; only rate limits and
+    # failed connections (nothing was sent) are retried for it
+    submit_retry = Retry(
+        total=5,
+        read=0,
+        backoff_factor=1.0,
+        status_forcelist=(429,),
+        allowed_methods=("HEAD", "POST"),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    # Requests picks the longest matching prefix, so status checks keep the
+    # default policy while song submissions get their own
+    session.mount(SUNO_API_URL, HTTPAdapter(pool_connections=1, pool_maxsize=8, max_retries=submit_retry))
+    session.mount(SUNO_STATUS_URL, adapter)
+    session.headers.update({
+        'User-Agent': 'singapore-river-dreams-song-generator',
+        'Content-Type': 'application/json'
+    })
+    return session
+
+# Suno reports rate limits and server errors in its response body. Only a
+# rate limit is resubmitted, up to SUNO_ATTEMPTS times: after a server error
+# the task may already exist, and resubmitting would bill a duplicate song
+SUNO_RETRY_CODES = (429,)
+SUNO_ATTEMPTS = 3
+
+# Songs per generation, one per genre; they are all written by one Claude
+# call and submitted to Suno at once
+MAX_GENRES = 3
+
+# Songs are polled with exponential backoff, from 2 s up to 30 s between
+# checks, for at most 5 minutes (Suno usually needs 2-5 minutes)
+SUNO_POLL_INITIAL_DELAY = 2
+SUNO_POLL_MAX_DELAY = 30
+SUNO_POLL_TIMEOUT = 5 * 60
+
+# Suno task states, as reported by the record-info endpoint
+SUNO_PROGRESS_LABELS = {
+    "PENDING": "Waiting in Suno's queue...",
+    "TEXT_SUCCESS": "Lyrics accepted, composing the music...",
+    "FIRST_SUCCESS": "First track ready, finishing the second..."
+}
+SUNO_FAILED_STATUSES = ("CREATE_TASK_FAILED", "GENERATE_AUDIO_FAILED", "CALLBACK_EXCEPTION", "SENSITIVE_WORD_ERROR")
 
 # Fixed Google Sheets URL
 FIXED_SHEET_URL = "https://docs.google.com/spreadsheets/d/1CRmG9M841oGGJjT8ks4b-2zR0vrFy0tHCMf_099Zxf0/edit?resourcekey=&gid=322702448#gid=322702448"
 
-def load_dreams_from_fixed_sheet():
-    """Load dreams from the fixed Google Sheets URL"""
+# Sheet the dreams are actually read from
+DREAMS_SHEET_ID = "19uPq9pUeJdYPwiUqvI2VvlHSXk_BE3ccrkR6eNY-n50"
+DREAMS_SHEET_GID = "1092449549"
+
+# Rows of the dataset shown before the user asks for all of them
+DATASET_PREVIEW_ROWS = 50
+
+@st.cache_data(ttl=60 * 5, max_entries=4, show_spinner=False)
+def load_dreams_from_fixed_sheet(sheet_id=DREAMS_SHEET_ID, gid=DREAMS_SHEET_GID):
+    """Load the dreams sheet as an Arrow table, cached for 5 minutes per sheet.
+
+    Errors are raised rather than shown so that failures are never cached;
+    the caller is responsible for reporting them.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    
+    # Query only the dreams column (column B - "What is your dream") as CSV
+    query = urllib.parse.quote("select B")
+    csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&headers=1&gid={gid}&tq={query}"
+    
+    # Download the CSV through the shared session (gzip-compressed)
+    response = get_http_session().get(csv_url, headers={'Accept-Encoding': 'gzip'}, timeout=(5, 30))
+    response.raise_for_status()
+    
+    # Parse with Arrow's multi-threaded reader; blank cells become nulls
+    table = pacsv.read_csv(
+        io.BytesIO(response.content),
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+    )
+    return table.cast(pa.schema([pa.field(name, pa.string()) for name in table.column_names]))
+
+class APIError(Exception):
+    """Raised when an API answers with an error response"""
+
+# Static instructions for Claude, sent as a cached system prompt; the text
+# must stay byte-identical between calls for Anthropic's prompt cache to hit
+LYRICS_INSTRUCTIONS = """Create 2-minute song lyrics that incorporates all the dreams listed by the user substracting any hate or bad words or dreams.
+
+Make the lyrics inspiring and cohesive. Structure it with verses and chorus.
+
+Write one version of the lyrics for each of the music styles listed by the user.
+Start each version with a line "## <style>" naming its style, in the same order, and write nothing else.
+Do not use "##" anywhere else; mark verses and choruses with plain lines such as "Verse 1:"."""
+
+# The per-call user message; only the dreams and styles change between calls
+LYRICS_PROMPT = """Dreams:
+{dreams}
+
+Music styles: {styles}"""
+
+# How long generated lyrics are reused for the same dreams, in seconds
+LYRICS_TTL = 60 * 60
+LYRICS_CACHE_DIR = os.path.expanduser("~/.cache/dreams-song")
+
+@st.cache_resource
+def _lyrics_cache():
+    """{key: (created, variants)} store of lyrics written by Claude.
+
+    Kept on disk with diskcache so lyrics survive restarts, or in memory
+    for this process when diskcache is not installed.
+    """
     try:
-        # Convert Google Sheets URL to CSV export URL
-        sheet_id = "19uPq9pUeJdYPwiUqvI2VvlHSXk_BE3ccrkR6eNY-n50"
-        gid = "1092449549"
-        csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
-        
-        # Read the CSV data
-        df = pd.read_csv(csv_url)
-        
-        # Extract only the dreams column (second column - "What is your dream")
-        if len(df.columns) >= 2:
-            dreams_column = df.columns[1]  # Second column
-            dreams_list = df[dreams_column].dropna().tolist()
-            return dreams_list, df
-        else:
-            st.error("The spreadsheet doesn't have the expected columns")
-            return [], None
-            
-    except Exception as e:
-        st.error(f"Error loading dreams from Google Sheet: {str(e)}")
-        return [], None
+        import diskcache
+    except ImportError:
+        return {}
+    return diskcache.Cache(LYRICS_CACHE_DIR)
+
+def _store_lyrics(cache, key, variants):
+    """Cache lyrics for LYRICS_TTL seconds, evicting expired ones from the in-memory store"""
+    now = time.time()
+    if isinstance(cache, dict):
+        for old_key, (created, _) in list(cache.items()):
+            if now - created > LYRICS_TTL:
+                cache.pop(old_key, None)
+        cache[key] = (now, variants)
+    else:
+        cache.set(key, (now, variants), expire=LYRICS_TTL)
+
+def _dreams_digest(dreams_list):
+    """SHA-256 of the dreams, independent of their order"""
+    return hashlib.sha256("\n".join(sorted(dreams_list)).encode()).hexdigest()
+
+# Longest pause before a Claude call while the request budget refills, in seconds
+CLAUDE_MAX_RATE_LIMIT_WAIT = 60
+
+@st.cache_resource
+def _claude_rate_limits():
+    """{api_key_hash: (remaining, reset_at)} as last reported in Claude's rate limit headers"""
+    return {}
 
-def generate_simple_lyrics(dreams_list, api_key):
-    """Generate simple 2-minute song lyrics using Claude API"""
+def _record_claude_rate_limit(api_key_hash, headers):
+    """Remember the key's remaining requests and when they refill"""
+    remaining = headers.get('anthropic-ratelimit-requests-remaining')
+    reset = headers.get('anthropic-ratelimit-requests-reset')
+    if remaining is None or not reset:
+        return
     
-    # Simple prompt as requested
-    dreams_text = "\n".join([f"- {dream}" for dream in dreams_list[:20]])  # Limit to first 20 dreams
+    try:
+        limit = (int(remaining), datetime.fromisoformat(reset.replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return
+    
+    # Budgets are per API key; forget those that have refilled since
+    limits = _claude_rate_limits()
+    now = time.time()
+    for other_hash, (_, reset_at) in list(limits.items()):
+        if reset_at <= now:
+            limits.pop(other_hash, None)
+    limits[api_key_hash] = limit
+
+def _wait_for_claude_rate_limit(api_key_hash):
+    """Sleep until the key's request budget refills if its last call used it up"""
+    remaining, reset_at = _claude_rate_limits().get(api_key_hash, (1, 0))
+    if remaining > 0:
+        return
     
-    prompt = f"""Create 2-minute song lyrics that incorporates all the following dreams substracting any hate or bad words or dreams:
+    wait = reset_at - time.time()
+    if wait > 0:
+        time.sleep(min(wait, CLAUDE_MAX_RATE_LIMIT_WAIT))
 
-{dreams_text}
+def _stream_lyrics(dreams_tuple, style_specs, api_key, api_key_hash):
+    """Stream Claude's lyrics for the style specs, yielding text as it arrives.
 
-Make the lyrics inspiring and cohesive. Structure it with verses and chorus."""
+    Each variant starts with a '## <style>' line so the text reads well
+    while streaming and can be split afterwards. Errors are raised.
+    """
+    
+    dreams_text = "\n".join(f"- {dream}" for dream in dreams_tuple)
+    prompt = LYRICS_PROMPT.format(dreams=dreams_text, styles=", ".join(style_specs))
 
     headers = {
-        'Content-Type': 'application/json',
         'x-api-key': api_key,
-        'anthropic-version': '2023-06-01'
+        'anthropic-version': '2023-06-01',
+        'Accept': 'text/event-stream'
     }
     
     data = {
         'model': 'claude-3-5-sonnet-20241022',
-        'max_tokens': 800,
+        'max_tokens': 800 * len(style_specs),
+        'stream': True,
+        'system': [
+            {
+                'type': 'text',
+                'text': LYRICS_INSTRUCTIONS,
+                'cache_control': {'type': 'ephemeral'}
+            }
+        ],
         'messages': [
             {
                 'role': 'user',
@@ -130,78 +336,624 @@ Make the lyrics inspiring and cohesive. Structure it with verses and chorus."""
         ]
     }
     
-    try:
-        response = requests.post(
-            'https://api.anthropic.com/v1/messages',
-            headers=headers,
-            json=data
-        )
+    _wait_for_claude_rate_limit(api_key_hash)
+    with get_http_session().post(CLAUDE_API_URL, headers=headers, data=orjson.dumps(data), timeout=API_TIMEOUT, stream=True) as response:
+        _record_claude_rate_limit(api_key_hash, response.headers)
+        if response.status_code != 200:
+            raise APIError(f"Claude API Error: {response.status_code} - {response.text}")
         
-        if response.status_code == 200:
-            result = response.json()
-            return result['content'][0]['text']
-        else:
-            st.error(f"Claude API Error: {response.status_code} - {response.text}")
-            return None
+        # Server-sent events are always UTF-8; only "data:" lines carry the payload.
+        # The body ends right after message_stop; reading it to the end rather
+        # than stopping at that event hands the connection back to the shared
+        # pool instead of closing it
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
             
-    except Exception as e:
-        st.error(f"Error calling Claude API: {str(e)}")
-        return None
+            event = orjson.loads(line[len('data:'):])
+            if event['type'] == 'content_block_delta' and event['delta']['type'] == 'text_delta':
+                yield event['delta']['text']
+            elif event['type'] == 'error':
+                raise APIError(f"Claude API Error: {event['error']['message']}")
 
-def generate_song_with_suno(lyrics, suno_config):
-    """Generate song using Suno API with user preferences"""
+def _split_variants(text, style_specs):
+    """Split streamed lyrics into {"variant", "lyrics"} dicts, one per style spec"""
+    # Only the expected style headings split the text, so any other markdown
+    # heading Claude writes stays part of the lyrics
+    headings = "|".join(map(re.escape, style_specs))
+    parts = re.split(rf'^##[ \t]*({headings})[ \t]*$', text, flags=re.MULTILINE)
+    variants = [
+        {"variant": name, "lyrics": lyrics.strip()}
+        for name, lyrics in zip(parts[1::2], parts[2::2])
+    ]
     
-    suno_url = "https://apibox.erweima.ai/api/v1/generate"
+    # A single version may come back without its heading
+    if not variants and len(style_specs) == 1:
+        variants = [{"variant": style_specs[0], "lyrics": text.strip()}]
     
-    headers = {
-        'Authorization': f'Bearer {suno_config["api_key"]}',
-        'Content-Type': 'application/json'
-    }
+    if len(variants) != len(style_specs):
+        raise APIError(f"Claude returned {len(variants)} lyric variants, expected {len(style_specs)}")
+    return variants
+
+def generate_simple_lyrics(dreams_list, api_key, style_specs):
+    """Generate simple 2-minute song lyrics using Claude API, one per style spec.
+
+    New lyrics are streamed to the page while Claude writes them; lyrics for
+    the same dreams, styles and API key are reused for LYRICS_TTL seconds.
+    """
     
-    # Build style string based on preferences
-    style_parts = [suno_config["genre"]]
+    # The prompt keeps the sheet order; the digest ignores it, so the same
+    # dreams drawn in another order hit the cache too
+    dreams_tuple = tuple(dreams_list)
+    dreams_digest = _dreams_digest(dreams_tuple)
+    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    cache = _lyrics_cache()
     
-    if suno_config["vocal_type"] != "Mixed":
-        style_parts.append(suno_config["vocal_type"])
+    try:
+        style_specs = tuple(style_specs)
+        key = (dreams_digest, style_specs, api_key_hash)
+        
+        created, variants = cache.get(key, (0, None))
+        if time.time() - created > LYRICS_TTL:
+            # Show the lyrics as they stream in, then hand over to the caller
+            placeholder = st.empty()
+            try:
+                with placeholder.container():
+                    text = st.write_stream(_stream_lyrics(dreams_tuple, style_specs, api_key, api_key_hash))
+            finally:
+                placeholder.empty()
+            
+            variants = _split_variants(text, style_specs)
+            _store_lyrics(cache, key, variants)
+        
+        return variants
     
-    if suno_config["additional_style"]:
-        style_parts.append(suno_config["additional_style"])
+    except APIError as e:
+        st.error(str(e))
+        return None
     
-    style_string = ", ".join(style_parts)
+    except Exception as e:
+        st.error(f"Error calling Claude API: {str(e)}")
+        return None
+
+# Fields of the Suno generate request that do not depend on the user's settings
+SUNO_BASE_PAYLOAD = {
+    'customMode': True
+}
+
+def _build_suno_payload(lyrics, suno_config):
+    """Build the Suno generate request body from the lyrics and user preferences"""
     
-    # Prepare the request data
-    data = {
+    # Style string based on preferences
+    style = (
+        suno_config["genre"]
+        + (f', {suno_config["vocal_type"]}' if suno_config["vocal_type"] != "Mixed" else "")
+        + (f', {suno_config["additional_style"]}' if suno_config["additional_style"] else "")
+    )
+    
+    return SUNO_BASE_PAYLOAD | {
         'prompt': lyrics if not suno_config["instrumental"] else suno_config.get("description", "Instrumental track based on dreams"),
-        'style': style_string,
+        'style': style,
         'title': suno_config["title"],
-        'customMode': True,
         'instrumental': suno_config["instrumental"],
         'model': suno_config["model"],
         'negativeTags': suno_config["negative_tags"],
         'callBackUrl': suno_config["callback_url"]
     }
+
+def _post_suno(session, payload, api_key):
+    """Submit one generate request to Suno and return its JSON body"""
+    headers = {
+        'Authorization': f'Bearer {api_key}'
+    }
+    
+    response = session.post(SUNO_API_URL, headers=headers, data=orjson.dumps(payload), timeout=API_TIMEOUT)
+    
+    if response.status_code != 200:
+        raise APIError(f"Suno API HTTP Error: {response.status_code} - {response.text}")
+    
+    return orjson.loads(response.content)
+
+def _request_song(session, lyrics, suno_config):
+    """Submit one song to Suno, resubmitting on its retryable codes. Errors are raised.
+
+    Runs on worker threads, so it must not call Streamlit.
+    """
+    
+    # Built once; resubmissions reuse the same body
+    payload = _build_suno_payload(lyrics, suno_config)
+    
+    for attempt in range(SUNO_ATTEMPTS):
+        result = _post_suno(session, payload, suno_config["api_key"])
+        if result.get('code') == 200:
+            return result
+        
+        if result.get('code') not in SUNO_RETRY_CODES or attempt == SUNO_ATTEMPTS - 1:
+            raise APIError(f"Suno API Error: {result.get('msg', 'Unknown error')}")
+        
+        time.sleep(2 ** attempt)
+
+async def _request_songs(session, jobs):
+    """Submit all (lyrics, suno_config) jobs at once; failures come back as exceptions"""
+    return await asyncio.gather(
+        *(asyncio.to_thread(_request_song, session, lyrics, suno_config) for lyrics, suno_config in jobs),
+        return_exceptions=True
+    )
+
+def generate_songs_with_suno(jobs):
+    """Generate one song per (lyrics, suno_config) job using Suno API, concurrently"""
+    
+    suno_results = asyncio.run(_request_songs(get_http_session(), jobs))
+    
+    for i, result in enumerate(suno_results):
+        if isinstance(result, Exception):
+            st.error(str(result) if isinstance(result, APIError) else f"Error calling Suno API: {str(result)}")
+            suno_results[i] = None
+    
+    return suno_results
+
+def check_suno_status(session, task_id, api_key):
+    """Fetch the generation record of a Suno task; thread-safe, errors are raised"""
+    headers = {
+        'Authorization': f'Bearer {api_key}'
+    }
+    
+    response = session.get(SUNO_STATUS_URL, params={'taskId': task_id}, headers=headers, timeout=API_TIMEOUT)
+    
+    if response.status_code != 200:
+        raise APIError(f"Suno API HTTP Error: {response.status_code} - {response.text}")
+    
+    result = orjson.loads(response.content)
+    if result.get('code') != 200:
+        raise APIError(f"Suno API Error: {result.get('msg', 'Unknown error')}")
+    
+    return result.get('data') or {}
+
+async def _check_songs(session, task_ids, api_key):
+    """Check the Suno tasks at once; failures come back as exceptions"""
+    return await asyncio.gather(
+        *(asyncio.to_thread(check_suno_status, session, task_id, api_key) for task_id in task_ids),
+        return_exceptions=True
+    )
+
+# Suno posts finished songs to the configured callback URL; it should be
+# tunnelled (e.g. with ngrok) to this local port
+SUNO_CALLBACK_PORT = int(os.environ.get("SUNO_CALLBACK_PORT", "8765"))
+SUNO_PLACEHOLDER_CALLBACK_URL = "https://api.example.com/callback"
+
+# Largest callback body accepted, in bytes
+SUNO_CALLBACK_MAX_BYTES = 1 << 20
+
+class _CallbackInbox:
+    """Suno callbacks for the tasks this process is waiting on"""
+    
+    def __init__(self):
+        # Sent to Suno in the callback URL; callbacks without it are refused
+        self.token = secrets.token_urlsafe(16)
+        self.waiting = set()
+        self.records = {}
+        self.arrived = threading.Condition()
+
+@st.cache_resource
+def _callback_inbox():
+    """The process-wide inbox filled by the callback server"""
+    return _CallbackInbox()
+
+def _callback_url_with_token(url):
+    """The callback URL with this process's callback token added to its query"""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(parts.query) + [('token', _callback_inbox().token)]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+def _callback_record(body):
+    """(task_id, record-info style record) for a Suno callback body, or (None, None)"""
+    data = body.get('data')
+    if not isinstance(data, dict):
+        data = {}
+    task_id = data.get('task_id') or data.get('taskId')
+    if not isinstance(task_id, str):
+        return None, None
+    
+    if body.get('code') != 200:
+        return task_id, {'status': "GENERATE_AUDIO_FAILED", 'errorMessage': str(body.get('msg'))}
+    if data.get('callbackType') != "complete":
+        return None, None
+    
+    songs = [
+        {'title': song.get('title'), 'audioUrl': song['audio_url']}
+        for song in data.get('data') or []
+        if isinstance(song, dict) and isinstance(song.get('audio_url'), str) and song['audio_url'].startswith("https://")
+    ]
+    return task_id, {'status': "SUCCESS", 'response': {'sunoData': songs}}
+
+class _SunoCallbackHandler(http.server.BaseHTTPRequestHandler):
+    """Store Suno callbacks for awaited tasks in the inbox as record-info style records"""
+    
+    def do_POST(self):
+        inbox = _callback_inbox()
+        token = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('token', [''])[0]
+        if not secrets.compare_digest(token.encode(), inbox.token.encode()):
+            self.send_error(403)
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if not 0 < length <= SUNO_CALLBACK_MAX_BYTES:
+                raise ValueError("bad body length")
+            body = orjson.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_error(400)
+            return
+        if not isinstance(body, dict):
+            self.send_error(400)
+            return
+        
+        task_id, record = _callback_record(body)
+        if record:
+            with inbox.arrived:
+                # Only tasks a poll loop is following are kept, so nothing piles up
+                if task_id in inbox.waiting:
+                    inbox.records[task_id] = record
+                    inbox.arrived.notify_all()
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"code": 200}')
+    
+    def log_message(self, format, *args):
+        pass
+
+@st.cache_resource
+def _start_callback_server(port):
+    """Listen for Suno callbacks on localhost in a background thread, once per process"""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _SunoCallbackHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _task_id(suno_result):
+    """Task ID of an accepted Suno generate request, if it has one"""
+    data = suno_result.get('data') or {}
+    return data.get('taskId') or data.get('task_id')
+
+def _show_songs(songs):
+    """Audio players for finished {"title", "audioUrl"} songs"""
+    for song in songs:
+        st.markdown(f"**{song['title']}**")
+        st.audio(song['audioUrl'])
+
+def _poll_songs(pending, api_key):
+    """Follow each {task_id: status box} task until it finishes or time runs out.
+
+    Callbacks from Suno wake the loop as soon as they arrive; tasks they have
+    not reported on are polled with backoff.
+    """
+    inbox = _callback_inbox()
+    task_ids = set(pending)
+    with inbox.arrived:
+        inbox.waiting.update(task_ids)
     
     try:
-        response = requests.post(suno_url, headers=headers, json=data)
+        _follow_songs(pending, api_key, inbox)
+    finally:
+        # Also runs when a rerun interrupts the loop
+        with inbox.arrived:
+            inbox.waiting.difference_update(task_ids)
+            for task_id in task_ids:
+                inbox.records.pop(task_id, None)
+
+def _follow_songs(pending, api_key, inbox):
+    """The polling loop of _poll_songs"""
+    deadline = time.monotonic() + SUNO_POLL_TIMEOUT
+    delay = SUNO_POLL_INITIAL_DELAY
+    
+    while pending and time.monotonic() + delay < deadline:
+        with inbox.arrived:
+            if not any(task_id in inbox.records for task_id in pending):
+                inbox.arrived.wait(timeout=delay)
+        delay = min(delay * 2, SUNO_POLL_MAX_DELAY)
+        
+        # Tasks no callback has reported on are checked concurrently
+        with inbox.arrived:
+            records = {task_id: inbox.records.pop(task_id) for task_id in pending if task_id in inbox.records}
+        unreported = [task_id for task_id in pending if task_id not in records]
+        if unreported:
+            records.update(zip(unreported, asyncio.run(_check_songs(get_http_session(), unreported, api_key))))
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('code') == 200:
-                return result
+        for task_id, status in list(pending.items()):
+            record = records[task_id]
+            if isinstance(record, Exception):
+                status.update(label=f"⚠️ Could not check progress: {str(record)}", state="error")
+                del pending[task_id]
+                continue
+            
+            state = record.get('status')
+            if state == "SUCCESS":
+                songs = [
+                    {"title": song.get('title') or "Your song", "audioUrl": song['audioUrl']}
+                    for song in (record.get('response') or {}).get('sunoData') or []
+                    if song.get('audioUrl')
+                ]
+                # Kept in the session so the players outlive this run
+                st.session_state.finished_songs.extend(songs)
+                with status:
+                    _show_songs(songs)
+                status.update(label="🎉 Your song is ready!", state="complete", expanded=True)
+                del pending[task_id]
+            elif state in SUNO_FAILED_STATUSES:
+                status.update(label=f"❌ Generation failed: {record.get('errorMessage') or state}", state="error")
+                del pending[task_id]
+            else:
+                status.update(label=f"🎵 {SUNO_PROGRESS_LABELS.get(state, 'Generating...')}")
+    
+    for status in pending.values():
+        status.update(label="⏳ Still generating. Check the Suno API logs for completion.", state="complete")
+
+def _preconnect(url):
+    """Open a pooled connection to url in the background, ignoring any errors"""
+    session = get_http_session()
+    
+    def connect():
+        try:
+            session.head(url, timeout=API_TIMEOUT)
+        except Exception:
+            pass
+    
+    threading.Thread(target=connect, daemon=True).start()
+
+@st.cache_resource
+def _prewarm_connections():
+    """Preconnect to Claude and Suno once per process, after the first page is drawn"""
+    for url in (CLAUDE_API_URL, SUNO_API_URL):
+        _preconnect(url)
+
+def _dream_key(dream):
+    """Comparison key of a dream: its words, ignoring case, punctuation and plural endings.
+
+    Dreams with no word characters (e.g. only emoji) are keyed on their own text.
+    """
+    words = re.sub(r"[^\w\s]", "", dream.casefold()).split()
+    if not words:
+        return " ".join(dream.casefold().split())
+    return " ".join(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in words
+    )
+
+def _unique_dreams(dreams, limit=None):
+    """The first limit dreams (all if None) that do not repeat an earlier one.
+
+    Dreams repeat when they differ only in case, spacing, punctuation or
+    plurals, e.g. "Kids swimming in the river!" and "kids swimming in the
+    rivers"; any added or removed word, such as "not", keeps both.
+    """
+    kept, seen = [], set()
+    
+    for dream in dreams:
+        if len(kept) == limit:
+            break
+        dream = dream.strip()
+        key = _dream_key(dream)
+        if not dream or key in seen:
+            continue
+        seen.add(key)
+        kept.append(dream)
+    
+    return tuple(kept)
+
+# Budget for the dreams in the Claude prompt, estimated at ~4 characters per token
+DREAMS_TOKEN_BUDGET = 4000
+CHARS_PER_TOKEN = 4
+
+def _fit_token_budget(dreams, budget=DREAMS_TOKEN_BUDGET):
+    """Longest prefix of dreams whose prompt lines fit in the token budget.
+
+    A first dream that alone is over budget is cut to fit, so the prompt
+    always has a dream and never exceeds the budget.
+    """
+    used = 0
+    for count, dream in enumerate(dreams):
+        # Each dream becomes a "- <dream>" line
+        used += (len(dream) + 3) / CHARS_PER_TOKEN
+        if used > budget:
+            if count == 0:
+                return (dream[:budget * CHARS_PER_TOKEN - 3],)
+            return dreams[:count]
+    return dreams
+
+@st.fragment
+def _dreams_panel():
+    """Dreams column; loading dreams only reruns this fragment"""
+    st.header("📊 Dreams Data")
+    
+    # Load dreams from fixed sheet
+    if st.button("📥 Load Dreams from Spreadsheet", type="primary"):
+        with st.spinner("Loading dreams from the fixed Google Sheet..."):
+            try:
+                dreams_table = load_dreams_from_fixed_sheet()
+            except Exception as e:
+                st.error(f"Error loading dreams from Google Sheet: {str(e)}")
             else:
-                st.error(f"Suno API Error: {result.get('msg', 'Unknown error')}")
-                return None
-        else:
-            st.error(f"Suno API HTTP Error: {response.status_code} - {response.text}")
-            return None
+                # Blank cells were read as nulls
+                dreams = tuple(dreams_table.column(0).drop_null().to_pylist())
+                
+                if dreams:
+                    st.session_state.dreams = dreams
+                    # Kept as Arrow so st.dataframe ships it without a pandas conversion
+                    st.session_state.dreams_table = dreams_table
+                    # Rerun the whole app so the song panel sees the new dreams
+                    st.rerun()
+    
+    if 'dreams' in st.session_state:
+        dreams = st.session_state.dreams
+        st.success(f"✅ Successfully loaded {len(dreams)} dreams!")
+        
+        # Show sample dreams
+        st.subheader("🌟 Sample Dreams")
+        sample_html = "".join(f'<div class="dream-box"><strong>Dream {i}:</strong> {dream}</div>' for i, dream in enumerate(dreams[:5], 1))
+        st.markdown(sample_html, unsafe_allow_html=True)
+        
+        if len(dreams) > 5:
+            st.info(f"And {len(dreams) - 5} more dreams...")
+    
+    # Display loaded data
+    if 'dreams_table' in st.session_state:
+        _dataset_view()
+
+@st.fragment
+def _dataset_view():
+    """Loaded dataset, first rows only unless the user asks for all of them"""
+    dreams_table = st.session_state.dreams_table
+    
+    st.subheader("📋 Full Dataset")
+    show_all = dreams_table.num_rows > DATASET_PREVIEW_ROWS and st.checkbox(f"Show all {dreams_table.num_rows} rows")
+    st.dataframe(
+        dreams_table if show_all else dreams_table.slice(0, DATASET_PREVIEW_ROWS),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def _show_song_request(genre, suno_result):
+    """Report a song request accepted by Suno; returns the box for its progress"""
+    st.markdown(f'<div class="success-box">✅ {genre} song generation request sent successfully!</div>', unsafe_allow_html=True)
+    
+    # Display task information
+    status = None
+    task_id = _task_id(suno_result)
+    if task_id:
+        st.info(f"🎵 Task ID: {task_id}")
+        
+        # Enhanced preview section
+        st.markdown(f"""
+        <div class="preview-box">
+            <h4>🎧 Preview Your Song</h4>
+            <p>Your song is being generated! Once complete (usually 2-5 minutes), you can preview and download it:</p>
+            <a href="https://sunoapi.org/logs" target="_blank" class="link-button">
+                🔗 Open Suno API Logs to Preview
+            </a>
+            <br><br>
+            <strong>📋 Your Task ID:</strong> <code>{task_id}</code>
+            <br><br>
+            <small>💡 <strong>How to find your song:</strong></small>
+            <ul>
+                <li>Click the link above to open Suno API logs</li>
+                <li>Search for your Task ID: <code>{task_id}</code></li>
+                <li>Once generation is complete, you'll see audio download links</li>
+                <li>Click to listen and download your song!</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Suno renders the song asynchronously; its progress is polled into this box
+        st.subheader("⏳ Generation Progress")
+        status = st.status("🎵 Generation process initiated...", expanded=False)
+
+    # Show the API response for debugging
+    with st.expander("🔍 API Response Details"):
+        st.json(suno_result)
+    
+    return status
+
+@st.fragment
+def _song_panel(claude_api_key, suno_config, max_dreams):
+    """Song generation column; generating a song only reruns this fragment"""
+    st.header("🎼 Song Generation")
+    
+    # Configuration summary
+    if suno_config["api_key"]:
+        st.markdown(f"""
+        <div class="config-section">
+            <h4>🎵 Current Configuration</h4>
+            <ul>
+                <li><strong>Title:</strong> {suno_config["title"]}</li>
+                <li><strong>Model:</strong> {suno_config["model"]}</li>
+                <li><strong>Genres:</strong> {", ".join(suno_config["genres"]) if suno_config["genres"] else "None selected"}</li>
+                <li><strong>Vocals:</strong> {"Instrumental Only" if suno_config["instrumental"] else suno_config["vocal_type"]}</li>
+                <li><strong>Style:</strong> {suno_config["additional_style"] if suno_config["additional_style"] else "Default"}</li>
+                <li><strong>Avoid:</strong> {suno_config["negative_tags"]}</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if 'dreams' in st.session_state and claude_api_key and suno_config["api_key"] and suno_config["genres"]:
+        if st.button("🎵 Generate Song", type="primary"):
+            # Distinct dreams in sheet order, only as many as the prompt takes
+            selected_dreams = _unique_dreams(st.session_state.dreams, max_dreams)
+            dreams_list = _fit_token_budget(selected_dreams)
+            if len(dreams_list) < len(selected_dreams):
+                st.info(f"ℹ️ Using the first {len(dreams_list)} dreams to keep the lyrics prompt within {DREAMS_TOKEN_BUDGET} tokens")
             
-    except Exception as e:
-        st.error(f"Error calling Suno API: {str(e)}")
-        return None
+            genres = suno_config["genres"]
+            
+            # Connect to Suno while Claude writes, so the songs do not wait on a handshake
+            _preconnect(SUNO_API_URL)
+            
+            # Take Suno's callbacks here too when a real callback URL is set
+            if suno_config["callback_url"] and suno_config["callback_url"] != SUNO_PLACEHOLDER_CALLBACK_URL:
+                try:
+                    _start_callback_server(SUNO_CALLBACK_PORT)
+                except OSError as e:
+                    st.warning(f"⚠️ Not listening for Suno callbacks on port {SUNO_CALLBACK_PORT}, progress will be polled: {str(e)}")
+                else:
+                    suno_config = {**suno_config, "callback_url": _callback_url_with_token(suno_config["callback_url"])}
+            
+            # Step 1: Generate lyrics with Claude, one version per genre
+            st.subheader("✍️ Generating Lyrics...")
+            with st.spinner("Claude is creating lyrics from all the dreams..."):
+                variants = generate_simple_lyrics(dreams_list, claude_api_key, genres)
+            
+            if variants:
+                st.markdown('<div class="success-box">✅ Lyrics generated successfully!</div>', unsafe_allow_html=True)
+                for variant in variants:
+                    st.markdown(f'<div class="lyrics-box"><h4>🎼 Generated Lyrics ({variant["variant"]}):</h4><pre>{variant["lyrics"]}</pre></div>', unsafe_allow_html=True)
+                
+                # Step 2: Generate all songs with Suno at once
+                st.subheader("🎵 Creating Song...")
+                
+                jobs = [
+                    (variant["lyrics"], {
+                        **suno_config,
+                        "genre": genre,
+                        "title": f'{suno_config["title"]} ({genre})' if len(genres) > 1 else suno_config["title"]
+                    })
+                    for variant, genre in zip(variants, genres)
+                ]
+                with st.spinner("Suno is composing your songs... This might take a few minutes."):
+                    suno_results = generate_songs_with_suno(jobs)
+                
+                # Store results in session state
+                st.session_state.lyric_variants = variants
+                st.session_state.suno_results = suno_results
+                st.session_state.finished_songs = []
+                
+                pending = {}
+                for genre, suno_result in zip(genres, suno_results):
+                    if suno_result:
+                        status = _show_song_request(genre, suno_result)
+                        if status:
+                            pending[_task_id(suno_result)] = status
+                
+                # Follow the songs until Suno has finished them
+                _poll_songs(pending, suno_config["api_key"])
+        
+        elif st.session_state.get("finished_songs"):
+            # Songs from the last generation, kept across reruns
+            st.subheader("🎧 Your Songs")
+            _show_songs(st.session_state.finished_songs)
+    
+    elif not claude_api_key or not suno_config["api_key"]:
+        st.info("👈 Please enter your API keys in the sidebar and apply the settings to start generating songs.")
+    
+    elif 'dreams' not in st.session_state:
+        st.info("👈 Please load dreams from the spreadsheet first.")
+    
+    elif not suno_config["genres"]:
+        st.info("👈 Please pick at least one genre in the sidebar.")
 
 def main():
-    st.markdown("<h1 class='main-header'>🎵 Singapore River Dreams Song Generator</h1>", unsafe_allow_html=True)
-    st.markdown("<p style='text-align: center; font-size: 1.2em; color: #666;'>Transform collective dreams about Singapore's river into beautiful songs</p>", unsafe_allow_html=True)
+    _inject_css()
+    _render_header()
     
     # Display the fixed spreadsheet link
     st.markdown(f"""
@@ -214,53 +966,72 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Sidebar for API keys
-    st.sidebar.header("🔑 API Configuration")
-    claude_api_key = st.sidebar.text_input("Claude API Key", type="password", help="Enter your Anthropic Claude API key")
-    suno_api_key = st.sidebar.text_input("Suno API Key", type="password", help="Enter your Suno API key")
-    
-    # Suno Configuration in Sidebar
-    st.sidebar.header("🎵 Suno Music Preferences")
-    
-    song_title = st.sidebar.text_input("Song Title", value="Singapore River Dreams", max_chars=80)
-    
-    model_version = st.sidebar.selectbox(
-        "Model Version",
-        ["V4_5", "V4", "V3_5"],
-        index=0,
-        help="V4_5: Up to 8min, superior blending | V4: Best quality, 4min | V3_5: Creative diversity, 4min"
-    )
-    
-    genre = st.sidebar.selectbox(
-        "Primary Genre",
-        ["Pop", "Folk", "Indie", "Acoustic", "Classical", "Electronic", "Rock", "Jazz", "R&B", "Country"]
-    )
-    
-    vocal_type = st.sidebar.selectbox(
-        "Vocal Preference",
-        ["Mixed", "Male Singer", "Female Singer"],
-        help="Choose the preferred vocal type for the song"
-    )
-    
-    instrumental_only = st.sidebar.checkbox("Instrumental Only", help="Generate instrumental music without vocals")
-    
-    additional_style = st.sidebar.text_input(
-        "Additional Style Elements",
-        placeholder="e.g., Uplifting, Dreamy, Inspirational",
-        help="Add extra style descriptors (optional)"
-    )
-    
-    negative_tags = st.sidebar.text_input(
-        "Styles to Avoid",
-        value="Heavy Metal, Aggressive, Dark",
-        help="Musical styles or traits to exclude from generation"
-    )
-    
-    callback_url = st.sidebar.text_input(
-        "Callback URL",
-        value="https://api.example.com/callback",
-        help="URL to receive completion notifications"
-    )
+    # Sidebar settings live in one form, so editing them does not rerun the
+    # app until they are applied
+    with st.sidebar.form("suno_config"):
+        # Sidebar for API keys
+        st.header("🔑 API Configuration")
+        claude_api_key = st.text_input("Claude API Key", type="password", help="Enter your Anthropic Claude API key")
+        suno_api_key = st.text_input("Suno API Key", type="password", help="Enter your Suno API key")
+        
+        # Lyrics Configuration in Sidebar
+        st.header("✍️ Lyrics Preferences")
+        
+        max_dreams = st.slider(
+            "Dreams per song",
+            min_value=5,
+            max_value=50,
+            value=20,
+            help="How many distinct dreams Claude weaves into the lyrics. Fewer dreams make lyrics faster to write"
+        )
+        
+        # Suno Configuration in Sidebar
+        st.header("🎵 Suno Music Preferences")
+        
+        song_title = st.text_input("Song Title", value="Singapore River Dreams", max_chars=80)
+        
+        model_version = st.selectbox(
+            "Model Version",
+            ["V4_5", "V4", "V3_5"],
+            index=0,
+            help="V4_5: Up to 8min, superior blending | V4: Best quality, 4min | V3_5: Creative diversity, 4min"
+        )
+        
+        genres = st.multiselect(
+            f"Genres (up to {MAX_GENRES})",
+            ["Pop", "Folk", "Indie", "Acoustic", "Classical", "Electronic", "Rock", "Jazz", "R&B", "Country"],
+            default=["Pop"],
+            max_selections=MAX_GENRES,
+            help="One song is generated per genre, all at the same time"
+        )
+        
+        vocal_type = st.selectbox(
+            "Vocal Preference",
+            ["Mixed", "Male Singer", "Female Singer"],
+            help="Choose the preferred vocal type for the song"
+        )
+        
+        instrumental_only = st.checkbox("Instrumental Only", help="Generate instrumental music without vocals")
+        
+        additional_style = st.text_input(
+            "Additional Style Elements",
+            placeholder="e.g., Uplifting, Dreamy, Inspirational",
+            help="Add extra style descriptors (optional)"
+        )
+        
+        negative_tags = st.text_input(
+            "Styles to Avoid",
+            value="Heavy Metal, Aggressive, Dark",
+            help="Musical styles or traits to exclude from generation"
+        )
+        
+        callback_url = st.text_input(
+            "Callback URL",
+            value=SUNO_PLACEHOLDER_CALLBACK_URL,
+            help=f"URL to receive completion notifications; forward it to port {SUNO_CALLBACK_PORT} of this app to get songs as soon as they are ready"
+        )
+        
+        st.form_submit_button("✅ Apply Settings", type="primary")
     
     # Add preview link in sidebar
     st.sidebar.header("🎧 Song Preview")
@@ -277,153 +1048,27 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Suno configuration from the sidebar
+    suno_config = {
+        "api_key": suno_api_key,
+        "title": song_title,
+        "genres": genres,
+        "vocal_type": vocal_type,
+        "additional_style": additional_style,
+        "instrumental": instrumental_only,
+        "model": model_version,
+        "negative_tags": negative_tags,
+        "callback_url": callback_url
+    }
+    
     # Main content
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.header("📊 Dreams Data")
-        
-        # Load dreams from fixed sheet
-        if st.button("📥 Load Dreams from Spreadsheet", type="primary"):
-            with st.spinner("Loading dreams from the fixed Google Sheet..."):
-                dreams_list, df = load_dreams_from_fixed_sheet()
-                
-                if dreams_list:
-                    st.session_state.dreams_list = dreams_list
-                    st.session_state.dreams_df = df
-                    st.success(f"✅ Successfully loaded {len(dreams_list)} dreams!")
-                    
-                    # Show sample dreams
-                    st.subheader("🌟 Sample Dreams")
-                    for i, dream in enumerate(dreams_list[:5], 1):
-                        st.markdown(f'<div class="dream-box"><strong>Dream {i}:</strong> {dream}</div>', unsafe_allow_html=True)
-                    
-                    if len(dreams_list) > 5:
-                        st.info(f"And {len(dreams_list) - 5} more dreams...")
-        
-        # Display loaded data
-        if 'dreams_df' in st.session_state:
-            st.subheader("📋 Full Dataset")
-            st.dataframe(st.session_state.dreams_df, use_container_width=True)
+        _dreams_panel()
     
     with col2:
-        st.header("🎼 Song Generation")
-        
-        # Configuration summary
-        if suno_api_key:
-            st.markdown(f"""
-            <div class="config-section">
-                <h4>🎵 Current Configuration</h4>
-                <ul>
-                    <li><strong>Title:</strong> {song_title}</li>
-                    <li><strong>Model:</strong> {model_version}</li>
-                    <li><strong>Genre:</strong> {genre}</li>
-                    <li><strong>Vocals:</strong> {"Instrumental Only" if instrumental_only else vocal_type}</li>
-                    <li><strong>Style:</strong> {additional_style if additional_style else "Default"}</li>
-                    <li><strong>Avoid:</strong> {negative_tags}</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        if 'dreams_list' in st.session_state and claude_api_key and suno_api_key:
-            if st.button("🎵 Generate Song", type="primary"):
-                dreams_list = st.session_state.dreams_list
-                
-                # Step 1: Generate lyrics with Claude
-                st.subheader("✍️ Generating Lyrics...")
-                with st.spinner("Claude is creating lyrics from all the dreams..."):
-                    lyrics = generate_simple_lyrics(dreams_list, claude_api_key)
-                    
-                   
-                   
-
-                
-                if lyrics:
-                    st.markdown('<div class="success-box">✅ Lyrics generated successfully!</div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="lyrics-box"><h4>🎼 Generated Lyrics:</h4><pre>{lyrics}</pre></div>', unsafe_allow_html=True)
-                    
-                    # Step 2: Generate song with Suno
-                    st.subheader("🎵 Creating Song...")
-                    
-                    # Prepare Suno configuration
-                    suno_config = {
-                        "api_key": suno_api_key,
-                        "title": song_title,
-                        "genre": genre,
-                        "vocal_type": vocal_type,
-                        "additional_style": additional_style,
-                        "instrumental": instrumental_only,
-                        "model": model_version,
-                        "negative_tags": negative_tags,
-                        "callback_url": callback_url
-                    }
-                    
-                    with st.spinner("Suno is composing your song... This might take a few minutes."):
-                        suno_result = generate_song_with_suno(lyrics, suno_config)
-                    
-                    if suno_result:
-                        st.markdown('<div class="success-box">✅ Song generation request sent successfully!</div>', unsafe_allow_html=True)
-                        
-                        # Store results in session state
-                        st.session_state.lyrics = lyrics
-                        st.session_state.suno_result = suno_result
-                        
-                        # Display task information
-                        if 'data' in suno_result:
-                            task_id = suno_result['data'].get('task_id')
-                            if task_id:
-                                st.info(f"🎵 Task ID: {task_id}")
-                                
-                                # Enhanced preview section
-                                st.markdown(f"""
-                                <div class="preview-box">
-                                    <h4>🎧 Preview Your Song</h4>
-                                    <p>Your song is being generated! Once complete (usually 2-5 minutes), you can preview and download it:</p>
-                                    <a href="https://sunoapi.org/logs" target="_blank" class="link-button">
-                                        🔗 Open Suno API Logs to Preview
-                                    </a>
-                                    <br><br>
-                                    <strong>📋 Your Task ID:</strong> <code>{task_id}</code>
-                                    <br><br>
-                                    <small>💡 <strong>How to find your song:</strong></small>
-                                    <ul>
-                                        <li>Click the link above to open Suno API logs</li>
-                                        <li>Search for your Task ID: <code>{task_id}</code></li>
-                                        <li>Once generation is complete, you'll see audio download links</li>
-                                        <li>Click to listen and download your song!</li>
-                                    </ul>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Progress estimation
-                                st.subheader("⏳ Generation Progress")
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                
-                                # Simulate progress
-                                for i in range(0, 101, 5):
-                                    progress_bar.progress(i)
-                                    if i < 30:
-                                        status_text.text(f"🎵 Analyzing lyrics and creating musical arrangement... {i}%")
-                                    elif i < 60:
-                                        status_text.text(f"🎤 Generating vocals and melody... {i}%")
-                                    elif i < 90:
-                                        status_text.text(f"🎚️ Mixing and mastering audio... {i}%")
-                                    else:
-                                        status_text.text(f"✨ Finalizing your song... {i}%")
-                                    time.sleep(0.1)
-                                
-                                status_text.text("🎉 Generation process initiated! Check the Suno API logs for completion.")
-                        
-                        # Show the API response for debugging
-                        with st.expander("🔍 API Response Details"):
-                            st.json(suno_result)
-        
-        elif not claude_api_key or not suno_api_key:
-            st.info("👈 Please enter your API keys in the sidebar to start generating songs.")
-        
-        elif 'dreams_list' not in st.session_state:
-            st.info("👈 Please load dreams from the spreadsheet first.")
+        _song_panel(claude_api_key, suno_config, max_dreams)
     
     # Footer
     st.markdown("---")
@@ -433,6 +1078,9 @@ def main():
         "</p>", 
         unsafe_allow_html=True
     )
+    
+    # Last, so loading requests and opening the connections never delays the page
+    _prewarm_connections()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+from app import _fit_token_budget, _unique_dreams
+
+
+def test_case_punctuation_and_plurals_collapse():
+    dreams = ("Kids swimming in the river!", "kids  swimming in the rivers", "More trees")
+    assert _unique_dreams(dreams) == ("Kids swimming in the river!", "More trees")
+
+
+def test_negated_dream_is_kept():
+    dreams = (
+        "In 2030 the river will be cleaner for everyone",
+        "In 2030 the river will not be cleaner for everyone",
+    )
+    assert _unique_dreams(dreams) == dreams
+
+
+def test_dreams_without_words_are_kept_apart():
+    assert _unique_dreams(("🌊🌊", "🎵", "!!!", " 🌊🌊 ")) == ("🌊🌊", "🎵", "!!!")
+
+
+def test_blank_dreams_are_dropped():
+    assert _unique_dreams(("  ", "Boats at night")) == ("Boats at night",)
+
+
+def test_stops_at_limit():
+    dreams = tuple(f"dream number {i}" for i in range(100))
+    assert _unique_dreams(dreams, 3) == dreams[:3]
+
+
+def test_fit_token_budget_keeps_the_prefix_that_fits():
+    dreams = ("a" * 37, "b" * 37, "c" * 37)
+    assert _fit_token_budget(dreams, budget=20) == dreams[:2]
+
+
+def test_fit_token_budget_cuts_an_oversize_first_dream():
+    fitted = _fit_token_budget(("x" * 100000, "y"), budget=10)
+    assert fitted == ("x" * 37,)